@@ -0,0 +1,52 @@
+# SPDX-FileCopyrightText: Copyright (c) 2022 Evin Dunn
+# SPDX-License-Identifier: MIT
+
+"""
+`tzdb._format`
+================================================================================
+
+The layout of the timezone database, shared by tzdb.timezone, which reads it,
+and utils/generate_tz_db.py, which writes it. See utils/generate_tz_db.py for
+a description of the layout
+
+
+* Author(s): Evin Dunn
+"""
+
+from struct import calcsize
+
+# CircuitPython's struct has no Struct class, so the formats and their sizes
+# are worked out once here instead of on every read
+COUNT_FORMAT = "<H"
+COUNT_SIZE = calcsize(COUNT_FORMAT)
+NAME_LEN_FORMAT = "<B"
+NAME_LEN_SIZE = calcsize(NAME_LEN_FORMAT)
+POS_FORMAT = "<I"
+POS_SIZE = calcsize(POS_FORMAT)
+ENTRY_SIZE = calcsize("<Ih")
+
+# Record formats by entry count. Only a handful of distinct counts exist
+_RECORD_FORMATS = {}
+
+
+def record_format(entry_count: int) -> str:
+    """
+    :return: The struct format of a record's keys followed by its offsets
+    :rtype: str
+    """
+    entry_format = _RECORD_FORMATS.get(entry_count)
+    if entry_format is None:
+        entry_format = f"<{entry_count}I{entry_count}h"
+        _RECORD_FORMATS[entry_count] = entry_format
+    return entry_format
+
+
+def pack_key(month: int, day: int, hour: int, minute: int) -> int:
+    """
+    Packs a point in the year into a single integer that sorts the same way the
+    point in the year does
+
+    :return: MMDDHHmm00 as an int
+    :rtype: int
+    """
+    return month * 10**8 + day * 10**6 + hour * 10**4 + minute * 100
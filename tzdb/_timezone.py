@@ -21,37 +21,140 @@ Implementation Notes
 * Adafruit's Datetime library: https://github.com/adafruit/Adafruit_CircuitPython_DateTime
 """
 
-from collections import OrderedDict
-from time import time
+from os import sep
+from struct import unpack, unpack_from
 
 from adafruit_datetime import datetime, timedelta, tzinfo
 
+from ._format import (
+    COUNT_FORMAT,
+    COUNT_SIZE,
+    ENTRY_SIZE,
+    NAME_LEN_SIZE,
+    POS_FORMAT,
+    POS_SIZE,
+    pack_key,
+    record_format,
+)
+
+try:
+    from bisect import bisect_right
+except ImportError:
+    # CircuitPython doesn't ship the bisect module
+    def bisect_right(keys, key: int) -> int:
+        """
+        :return: The index at which key would be inserted into the sorted keys,
+            to the right of any equal entries
+        :rtype: int
+        """
+        low = 0
+        high = len(keys)
+        while low < high:
+            mid = (low + high) // 2
+            if key < keys[mid]:
+                high = mid
+            else:
+                low = mid + 1
+        return low
+
+
+# os.path isn't available on CircuitPython, so the directory of this module is
+# everything up to and including its last separator
+_TZ_DB_FILE = "_tzdb.bin"
+_TZ_DB_PATH = __file__[: __file__.rfind(sep) + 1] + _TZ_DB_FILE
+_ZERO = timedelta(hours=0)
+
+# Every timezone created so far, by name, so each zone is only loaded once
+_INSTANCES = {}
+
+
+def _load_db() -> bytes:
+    """
+    Reads the index at the start of the timezone database. The index is kept
+    as raw bytes rather than decoded into a dict of every timezone name, and
+    the records themselves are left on disk until a timezone is created
+
+    :return: The encoded name entries of the index
+    :rtype: bytes
+    """
+    with open(_TZ_DB_PATH, "rb") as db_handle:
+        (index_size,) = unpack(COUNT_FORMAT, db_handle.read(COUNT_SIZE))
+        return db_handle.read(index_size)
+
+
+def _find_record(tz_db: bytes, tz_name: str):
+    """
+    Walks the encoded index entries, only comparing names of the same length
+
+    :param tz_db: The index returned by _load_db
+    :type tz_db: bytes
+    :param tz_name: The name of the IANA timezone to look up
+    :type tz_name: str
+    :return: The position of tz_name's record in the database, or None if
+        tz_name isn't in the database
+    :rtype: int
+    """
+    encoded_name = tz_name.encode()
+    name_len = len(encoded_name)
+    pos = 0
+    while pos < len(tz_db):
+        entry_name_len = tz_db[pos]
+        pos += NAME_LEN_SIZE
+        if entry_name_len == name_len and tz_db[pos : pos + name_len] == encoded_name:
+            return unpack_from(POS_FORMAT, tz_db, pos + name_len)[0]
+        pos += entry_name_len + POS_SIZE
+    return None
+
 
 class timezone(tzinfo):
     # pylint: disable=invalid-name
     """
     Subclass of tzinfo for calculating the utc offset of a given datetime
 
-    A python file is generated in _zones/ for each timezone in the following
-    format::
+    The offset data for every timezone is generated into a single binary file,
+    _tzdb.bin. Each timezone is stored as a record of sorted keys and offsets,
+    for example::
 
-        tz_data = {
-            "2022-01-01T00:00:00": -6.0,
-            "2022-03-13T03:00:00": -5.0,
-            "2022-11-06T02:00:00": -6.0,
-            "2022-10-31T00:00:00": -5.0
-        }
+        keys = (101000000, 308030000, 1101020000)
+        offsets = (-360, -300, -360)
 
-    Meaning that:
+    Where each key is a point in the year packed as the integer MMDDHHmm00 and
+    each offset is in minutes east of UTC, meaning that:
 
-    * On January 1st, the UTC offset is -6
-    * On March 13th, the UTC offset changes to -5
+    * On January 1st, the UTC offset is -6 hours
+    * On March 8th at 03:00, the UTC offset changes to -5 hours
     * etc.
 
-    One of these files is lazily imported based on the tz_name passed to the
-    constructor
+    Only the record for the tz_name passed to the constructor is read from the
+    file. The keys are generated already sorted so that utcoffset() is a
+    binary search rather than a scan over every transition
+
+    See utils/generate_tz_db.py for the layout of the file
     """
 
+    _TZ_DB = None
+
+    # Offset timedeltas shared by every timezone, by minutes east of UTC.
+    # Seeded with the most common offsets
+    _TD_CACHE = {
+        minutes: timedelta(minutes=minutes)
+        for minutes in (0, 60, 120, -300, -360, -420, -480)
+    }
+
+    def __new__(cls, tz_name: str):
+        """
+        Returns the existing instance if a timezone named tz_name has already
+        been created, so that repeated timezone(tz_name) calls don't reload it
+        from the _TZ_DB
+
+        :param: tz_name The name of the IANA timezone to create
+        :type tz_name: str
+        """
+        instance = _INSTANCES.get(tz_name)
+        if instance is None:
+            instance = super().__new__(cls)
+        return instance
+
     def __init__(self, tz_name: str):
         """
         Create a new timezone with tz_name. The timezone contains the offset
@@ -60,17 +163,65 @@ class timezone(tzinfo):
         :param: tz_name The name of the IANA timezone to create
         :type tz_name: str
         """
+        # Already loaded, this is an instance returned from _INSTANCES
+        if hasattr(self, "_keys"):
+            return
+
         self._tz_name = tz_name
 
         # Lazy-load on creation of first timezone instance
-        pkg = __import__(
-            "_zones." + tz_name.replace("/", "."), globals(), locals(), ["tz_data"], 1
-        )
-        sorted_kv_pairs = sorted(
-            pkg.tz_data.items(),
-            key=lambda kv_pair: datetime.fromisoformat(kv_pair[0]),
-        )
-        self._tz_data = OrderedDict(sorted_kv_pairs)
+        tz_db = timezone._TZ_DB
+        if tz_db is None:
+            tz_db = _load_db()
+            timezone._TZ_DB = tz_db
+
+        record_pos = _find_record(tz_db, tz_name)
+        if record_pos is None:
+            raise ValueError(f"Unknown timezone: {tz_name}")
+
+        with open(_TZ_DB_PATH, "rb") as db_handle:
+            db_handle.seek(record_pos)
+            (entry_count,) = unpack(COUNT_FORMAT, db_handle.read(COUNT_SIZE))
+            record = unpack_from(
+                record_format(entry_count), db_handle.read(entry_count * ENTRY_SIZE)
+            )
+
+        self._keys = record[:entry_count]
+        offsets = record[entry_count:]
+        # Build each offset's timedelta once here rather than on every lookup,
+        # reusing one timedelta per distinct offset across all timezones
+        td_cache = timezone._TD_CACHE
+        self._offset_tds = []
+        for offset in offsets:
+            offset_td = td_cache.get(offset)
+            if offset_td is None:
+                offset_td = timedelta(minutes=offset)
+                td_cache[offset] = offset_td
+            self._offset_tds.append(offset_td)
+
+        # Bounds for the utcoffset() fast paths
+        self._first_key = self._keys[0]
+        self._last_key = self._keys[-1]
+        self._tz_last_td = self._offset_tds[-1]
+
+        # The [low, high) key range of the most recent utcoffset() lookup and
+        # its result. Keys are independent of the year so this never needs to
+        # be invalidated
+        self._cache_lo = 0
+        self._cache_hi = 0
+        self._cache_td = None
+
+        _INSTANCES[tz_name] = self
+
+    @classmethod
+    def free(cls):
+        """
+        Releases the timezone database index read by the first timezone
+        created. Call this once every timezone that's needed has been created
+        to reclaim its memory; creating another timezone afterward reads the
+        index again
+        """
+        cls._TZ_DB = None
 
     @property
     def name(self):
@@ -88,12 +239,18 @@ class timezone(tzinfo):
             timedelta object that is positive east of UTC.
         :rtype: adafruit_datetime.timedelta
         """
-        offset = timedelta(hours=0)
-        for iso_ts, db_offset in self._tz_data.items():
-            iso_dt = datetime.fromisoformat(iso_ts).replace(year=dt.year)
-            if dt >= iso_dt:
-                offset = timedelta(hours=db_offset)
-        return offset
+        key = pack_key(dt.month, dt.day, dt.hour, dt.minute)
+        if key >= self._last_key:
+            return self._tz_last_td
+        if key < self._first_key:
+            return _ZERO
+        if self._cache_lo <= key < self._cache_hi:
+            return self._cache_td
+        idx = bisect_right(self._keys, key) - 1
+        self._cache_lo = self._keys[idx]
+        self._cache_hi = self._keys[idx + 1]
+        self._cache_td = self._offset_tds[idx]
+        return self._cache_td
 
     def fromutc(self, dt: "datetime") -> "datetime":
         """
@@ -104,11 +261,9 @@ class timezone(tzinfo):
         :return: The UTC datetime dt in local time
         :rtype: adafruit_datetime.datetime
         """
-        # This is how you retrieve utc time on a pi pico rtc
-        now_ts = time()
-        now = datetime.fromtimestamp(now_ts)
-        offset = self.utcoffset(now)
-        return dt + offset
+        # The keys are local times, so within one utc offset of a transition
+        # this can pick the offset from the other side of it
+        return dt + self.utcoffset(dt)
 
     def tzname(self, dt: "datetime") -> str:
         """
@@ -117,8 +272,4 @@ class timezone(tzinfo):
         :return: the time zone name corresponding to the datetime object dt, as a string
         :rtype: str
         """
-        if not isinstance(dt.tzinfo, self.__class__):
-            raise ValueError(
-                f"datetime.tzinfo is not an instance of {self.__class__.__name__}"
-            )
-        return dt.tzinfo.name
+        return self._tz_name
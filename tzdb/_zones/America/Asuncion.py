@@ -1 +0,0 @@
-tz_data = {'2022-01-01T00:00:00': -3.0, '2022-03-27T00:00:00': -4.0, '2022-10-02T01:00:00': -3.0, '2022-09-26T00:00:00': -4.0}
@@ -1 +0,0 @@
-tz_data = {'2022-01-01T00:00:00': -3.0, '2022-04-03T00:00:00': -4.0, '2022-03-28T00:00:00': -3.0, '2022-09-04T01:00:00': -3.0, '2022-08-29T00:00:00': -4.0}
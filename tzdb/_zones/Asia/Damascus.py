@@ -1 +0,0 @@
-tz_data = {'2022-01-01T00:00:00': 2.0, '2022-03-25T01:00:00': 3.0, '2022-10-28T00:00:00': 2.0}
@@ -1 +0,0 @@
-tz_data = {'2022-01-01T00:00:00': 3.0, '2022-03-22T01:00:00': 4.0, '2022-09-22T00:00:00': 3.0}
@@ -1 +0,0 @@
-tz_data = {'2022-01-01T00:00:00': -1.0}
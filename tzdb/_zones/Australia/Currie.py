@@ -1 +0,0 @@
-tz_data = {'2022-01-01T00:00:00': 11.0, '2022-04-03T03:00:00': 10.0, '2022-03-28T00:00:00': 11.0, '2022-10-02T03:00:00': 11.0, '2022-09-26T00:00:00': 10.0}
@@ -1 +0,0 @@
-tz_data = {'2022-01-01T00:00:00': -6.0, '2022-03-13T03:00:00': -5.0, '2022-11-06T02:00:00': -6.0, '2022-10-31T00:00:00': -5.0}
@@ -1 +0,0 @@
-tz_data = {'2022-01-01T00:00:00': 0.0, '2022-03-27T02:00:00': 1.0, '2022-10-30T02:00:00': 0.0}
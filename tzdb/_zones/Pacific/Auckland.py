@@ -1 +0,0 @@
-tz_data = {'2022-01-01T00:00:00': 13.0, '2022-04-03T03:00:00': 12.0, '2022-03-28T00:00:00': 13.0, '2022-09-25T03:00:00': 13.0}
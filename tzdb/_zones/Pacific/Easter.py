@@ -1 +0,0 @@
-tz_data = {'2022-01-01T00:00:00': -5.0, '2022-04-02T22:00:00': -6.0, '2022-03-28T00:00:00': -5.0, '2022-09-03T23:00:00': -5.0, '2022-08-29T00:00:00': -6.0}
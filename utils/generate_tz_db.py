@@ -4,157 +4,292 @@
 # SPDX-License-Identifier: MIT
 
 """
-This script uses python>=3.9's ZoneInfo to generate a msgpack-encoded timezone
-dict with the following format:
-{
-    "<name>": {
-        "<iso_date>": <offset from utc>
-    }
-}
-
-Ex:
-{
-    "America/Chicago": {
-        "2022-01-01T00:00:00": -6.0,
-        "2022-03-13T03:00:00": -5.0,
-        "2022-11-06T02:00:00": -6.0,
-        "2022-10-31T00:00:00": -5.0
-    }
-}
+This script uses python>=3.9's ZoneInfo to generate tzdb/_tzdb.bin, a single
+little-endian binary file containing every timezone. The file starts with an
+index of the timezone names:
+
+    u16 size of the following name entries in bytes
+    for each timezone:
+        u8  length of the name
+        ... the ascii name, ex: "America/Chicago"
+        u32 position of the timezone's record from the start of the file
+
+Followed by one record per distinct set of transitions. Timezones that share
+the same transitions, such as America/Chicago and America/Menominee, point at
+the same record:
+
+    u16 number of entries (n)
+    u32 * n sorted keys
+    i16 * n offsets
+
+Where each key is a point in the year packed as the integer MMDDHHmm00 and
+offsets[i] is the offset from utc from keys[i] onward, in minutes east of utc.
+For example, the record for "America/Chicago" is:
+
+    keys = (101000000, 308030000, 1101020000)
+    offsets = (-360, -300, -360)
 
 Meaning that:
-- On January 1st, the UTC offset in Chicago is -6
-- On March 13th, the UTC offset changes to -5
+- On January 1st, the UTC offset in Chicago is -6 hours
+- On March 8th at 03:00, the UTC offset changes to -5 hours
 - etc.
 
+The keys are written already sorted so that tzdb.timezone can use them as-is
+without parsing or sorting anything at runtime, and only the record for the
+requested timezone is ever read from the file.
+
 Only IANA canonical timezones are included to keep the size of the database
 small
 """
 
-from calendar import Calendar
 from concurrent.futures import ProcessPoolExecutor
-from datetime import datetime, tzinfo
-from multiprocessing import Lock
+from datetime import datetime, timedelta
+from os import cpu_count
 from pathlib import Path
-from shutil import rmtree
-from typing import Iterable
+from struct import pack
+from typing import Dict, List, Tuple
 from zoneinfo import ZoneInfo, available_timezones
+from zoneinfo._zoneinfo import ZoneInfo as PyZoneInfo, _TZStr
+
+try:
+    from tzdb import _format
+except ImportError:
+    from sys import path as sys_path
 
+    sys_path.insert(0, str(Path(__file__).parent.parent))
+    from tzdb import _format
 
-PROC_LOCK = Lock()
+
+ONE_DAY = timedelta(days=1)
+ONE_MINUTE = timedelta(minutes=1)
 
 # Target canonical timezones only to keep the output small
-TARGETS = [
-    "Africa",
-    "America",
-    "Asia",
-    "Atlantic",
-    "Australia",
-    "Canada",
-    "Europe",
-    "Indian",
-    "Pacific",
-    "UTC",
-]
+TARGETS = frozenset(
+    (
+        "Africa",
+        "America",
+        "Asia",
+        "Atlantic",
+        "Australia",
+        "Canada",
+        "Europe",
+        "Indian",
+        "Pacific",
+        "UTC",
+    )
+)
 
 
-def iteryear(
-    utc_now: datetime, calendar: Calendar, tz_info: tzinfo
-) -> Iterable[datetime]:
+def pack_key(instant: datetime) -> int:
     """
-    Iterates over every minute of every day for the year in utc_now
+    Packs the month, day, hour and minute of instant into the integer key used
+    by the database, see tzdb._format.pack_key
     """
-    epoch = datetime.min
-    for month_idx in range(1, 13):
-        for date in calendar.itermonthdates(utc_now.year, month_idx):
-            date_time = datetime.combine(date, epoch.time(), tzinfo=tz_info)
-            for hour in range(0, 24):
-                for minute in range(0, 60):
-                    yield date_time.replace(hour=hour, minute=minute)
+    return _format.pack_key(instant.month, instant.day, instant.hour, instant.minute)
+
+
+def get_utc_offset(instant: datetime) -> int:
+    """
+    Returns the utc offset of the timezone-aware instant, in minutes east of
+    utc
+    """
+    utc_offset = instant.utcoffset()
+    if utc_offset is None:
+        raise ValueError(f"UTC offset is None for {instant}")
+    return int(utc_offset.total_seconds() // 60)
+
+
+def find_transitions(
+    low: datetime,
+    high: datetime,
+    low_offset: int,
+    high_offset: int,
+    utc_offset_dict: Dict[int, int],
+):
+    """
+    Bisects the wall-clock interval (low, high] for the minute at which the utc
+    offset changes from low_offset to high_offset, recording it in
+    utc_offset_dict. The interval is assumed to contain at most one change
+    """
+    if low_offset == high_offset:
+        return
+
+    if high - low <= ONE_MINUTE:
+        utc_offset_dict[pack_key(high)] = high_offset
+        return
+
+    middle = low + (high - low) / 2
+    middle = middle.replace(second=0, microsecond=0)
+    middle_offset = get_utc_offset(middle)
+
+    find_transitions(low, middle, low_offset, middle_offset, utc_offset_dict)
+    find_transitions(middle, high, middle_offset, high_offset, utc_offset_dict)
+
+
+def read_transitions(
+    tz_name: str, jan_1: datetime, dec_31: datetime, utc_offset_dict: Dict[int, int]
+) -> bool:
+    """
+    Records the changes in utc offset between jan_1 and dec_31 using the
+    transitions ZoneInfo already parsed from the timezone's TZif file, rather
+    than searching for them.
+
+    Returns False without recording anything if the year is past the
+    transitions listed in the file and the rest are described by a POSIX TZ
+    rule instead, as in "slim" TZif files
+    """
+    # pylint: disable=protected-access
+    # The C ZoneInfo doesn't expose its transitions, the pure python one does
+    py_timezone = PyZoneInfo.no_cache(tz_name)
+    trans_utc = py_timezone._trans_utc
+    start_ts = jan_1.timestamp()
+    end_ts = dec_31.timestamp()
+
+    covered = trans_utc and trans_utc[-1] >= end_ts
+    if not covered and isinstance(py_timezone._tz_after, _TZStr):
+        return False
 
+    for trans_ts in trans_utc:
+        if not start_ts < trans_ts <= end_ts:
+            continue
 
-def serialize_timezone(out_dir: Path, tz_name: str):
+        instant = datetime.fromtimestamp(trans_ts, tz=jan_1.tzinfo)
+        old_offset = get_utc_offset(instant - timedelta(seconds=1))
+        new_offset = get_utc_offset(instant)
+        if old_offset == new_offset:
+            continue
+
+        # ZoneInfo resolves skipped and repeated wall-clock times with the
+        # earlier offset, so the new offset starts at the later of the two
+        # possible local times
+        wall_time = instant + timedelta(
+            minutes=max(old_offset, new_offset) - new_offset
+        )
+        utc_offset_dict[pack_key(wall_time)] = new_offset
+
+    return True
+
+
+def probe_transitions(
+    jan_1: datetime, dec_31: datetime, utc_offset_dict: Dict[int, int]
+):
     """
-    Serializes the timezone with the given tz_name to a dictionary, where keys
-    represent iso timestamps and values represent a change in utc offset at the
-    timestamp. If the dict is empty, the timezone is equivalent to utc all
-    year round.
+    Records the changes in utc offset between jan_1 and dec_31 by probing the
+    start of each day and only bisecting the days where the offset changes
     """
-    with PROC_LOCK:
-        print(f"Serializing {tz_name}...")
+    # No timezone changes its offset twice in one day, and since the probes
+    # are walked in order, consecutive identical offsets are never recorded
+    utc_offset = get_utc_offset(jan_1)
+    day = jan_1
+    while day < dec_31:
+        next_day = min(day + ONE_DAY, dec_31)
+        next_offset = get_utc_offset(next_day)
+        find_transitions(day, next_day, utc_offset, next_offset, utc_offset_dict)
+        day = next_day
+        utc_offset = next_offset
 
-    utc_now = datetime.now(tz=ZoneInfo("UTC"))
-    calendar = Calendar()
 
+def serialize_timezone(
+    tz_name: str, year: int
+) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    """
+    Serializes the timezone with the given tz_name to the sorted packed keys of
+    each change in utc offset during year and the offset in effect from each
+    key onward
+    """
     timezone = ZoneInfo.no_cache(tz_name)
-    jan_1 = datetime(year=utc_now.year, month=1, day=1, tzinfo=timezone)
-    utc_offset = jan_1.utcoffset()
+    jan_1 = datetime(year=year, month=1, day=1, tzinfo=timezone)
+    dec_31 = datetime(year=year, month=12, day=31, hour=23, minute=59, tzinfo=timezone)
 
-    if utc_offset is None:
-        raise ValueError("UTC offset is None for given tzinfo")
+    utc_offset_dict = {pack_key(jan_1): get_utc_offset(jan_1)}
+    if not read_transitions(tz_name, jan_1, dec_31, utc_offset_dict):
+        probe_transitions(jan_1, dec_31, utc_offset_dict)
 
-    utc_offset = utc_offset.total_seconds() // 3600
-    utc_offset_dict = {jan_1.replace(tzinfo=None).isoformat(): utc_offset}
+    keys = tuple(sorted(utc_offset_dict))
+    offsets = tuple(utc_offset_dict[key] for key in keys)
 
-    for instant in iteryear(utc_now, calendar, timezone):
-        new_utc_offset = instant.utcoffset()
-        if new_utc_offset is None:
-            raise ValueError("UTC offset is None for given utc_now, calendar, timezone")
+    return keys, offsets
 
-        new_utc_offset = new_utc_offset.total_seconds() // 3600
-        if abs(new_utc_offset - utc_offset) > 0.1:
-            iso_ts = instant.replace(tzinfo=None).isoformat()
-            utc_offset_dict[iso_ts] = new_utc_offset
-            utc_offset = new_utc_offset
 
-    if "/" in tz_name:
-        path_parts = tz_name.split("/")
-        lib_dir = Path("/".join(path_parts[:-1]))
-        tz_file = path_parts[-1]
-        lib_dir = out_dir / lib_dir
-    else:
-        lib_dir = out_dir
-        tz_file = tz_name
+def serialize_chunk(
+    tz_names: List[str],
+) -> List[Tuple[str, Tuple[Tuple[int, ...], Tuple[int, ...]]]]:
+    """
+    Serializes each of tz_names in this process, so that the per-task setup is
+    paid once per chunk rather than once per timezone
+    """
+    print(f"Serializing {len(tz_names)} timezones starting with {tz_names[0]}...")
 
-    with PROC_LOCK:
-        if not lib_dir.exists():
-            lib_dir.mkdir()
-            (lib_dir / "__init__.py").touch()
+    year = datetime.now(tz=ZoneInfo("UTC")).year
+    results = [(tz_name, serialize_timezone(tz_name, year)) for tz_name in tz_names]
 
-    tz_file = lib_dir / (tz_file + ".py")
-    with open(tz_file, "w", encoding="utf-8") as tz_handle:
-        tz_handle.write(f"tz_data = {utc_offset_dict}\n")
+    print(f"{len(tz_names)} timezones starting with {tz_names[0]} complete")
+    return results
 
-    with PROC_LOCK:
-        print(f"{tz_name} complete")
 
+def write_db(db_file: Path, timezones: Dict[str, Tuple[Tuple[int, ...], ...]]):
+    """
+    Writes the serialized timezones to db_file in the format described at the
+    top of this file
+    """
+    names = sorted(timezones)
 
-# Grab the list of target timezone names
-tznames = []
-for tzname in sorted(available_timezones()):
-    for target in TARGETS:
-        if tzname.startswith(target):
-            tznames.append(tzname)
-            break
+    index_size = _format.COUNT_SIZE + sum(
+        _format.NAME_LEN_SIZE + len(name) + _format.POS_SIZE for name in names
+    )
+    index = [pack(_format.COUNT_FORMAT, index_size - _format.COUNT_SIZE)]
+    records = []
+    record_pos = index_size
 
-# Write the result to file
-this_file = Path(__file__)
-repo_root = this_file.parent.parent
-out_pkg = repo_root / "tzdb" / "_zones"
+    # Position of each distinct record, so identical records are written once
+    record_positions = {}
+
+    for name in names:
+        keys, offsets = timezones[name]
+        record = pack(_format.COUNT_FORMAT, len(keys)) + pack(
+            _format.record_format(len(keys)), *keys, *offsets
+        )
+
+        if record not in record_positions:
+            record_positions[record] = record_pos
+            records.append(record)
+            record_pos += len(record)
+
+        encoded_name = name.encode("ascii")
+        index.append(pack(_format.NAME_LEN_FORMAT, len(encoded_name)))
+        index.append(encoded_name)
+        index.append(pack(_format.POS_FORMAT, record_positions[record]))
 
-if out_pkg.exists():
-    rmtree(out_pkg)
+    print(f"Wrote {len(records)} distinct records for {len(names)} timezones")
 
-out_pkg.mkdir()
-(out_pkg / "__init__.py").touch()
+    with open(db_file, "wb") as db_handle:
+        db_handle.writelines(index)
+        db_handle.writelines(records)
+
+
+# Grab the list of target timezone names
+tznames = [
+    tzname
+    for tzname in sorted(available_timezones())
+    if tzname.split("/", 1)[0] in TARGETS
+]
+
+# Serialize the target timezones, one chunk per cpu
+chunk_count = min(cpu_count() or 1, len(tznames))
+chunks = [tznames[i::chunk_count] for i in range(chunk_count)]
 
-# Serialize the target timezones
 processes = []
-with ProcessPoolExecutor() as pool:
-    for tzname in tznames:
-        proc = pool.submit(serialize_timezone, out_pkg, tzname)
+with ProcessPoolExecutor(max_workers=chunk_count) as pool:
+    for chunk in chunks:
+        proc = pool.submit(serialize_chunk, chunk)
         processes.append(proc)
 
 # Check for errors
+serialized = {}
 for proc in processes:
-    proc.result()
+    serialized.update(proc.result())
+
+# Write the result to file
+this_file = Path(__file__)
+repo_root = this_file.parent.parent
+write_db(repo_root / "tzdb" / "_tzdb.bin", serialized)